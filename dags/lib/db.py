@@ -1,5 +1,7 @@
 """Database utility functions"""
-from typing import Optional, Iterator, Dict, Any, List
+from typing import Optional, Iterator, Iterable, Dict, Any, List, Tuple
+import math
+import re
 import sqlite3
 
 
@@ -28,33 +30,35 @@ def get_customer_journeys_batch(
     conversion_start_date_filter = f" AND c.conv_date >= '{start_date}' " if start_date else ""
     conversion_end_date_filter = f" AND c.conv_date <= '{end_date}' " if end_date else ""
     conversion_query = f"""
-        SELECT DISTINCT conv_id FROM conversions WHERE 1 
+        SELECT conv_key FROM conversions c WHERE 1 
         {conversion_start_date_filter}
         {conversion_end_date_filter}
-        ORDER BY conv_id
+        ORDER BY conv_key
     """
     
-    # First, get all conversion IDs
+    # First, get all conversion keys
     cursor = conn.cursor()
     cursor.execute(conversion_query)
-    all_conv_ids = [row[0] for row in cursor.fetchall()]
+    all_conv_keys = [row[0] for row in cursor.fetchall()]
     
     # Process conversions in batches
-    for i in range(0, len(all_conv_ids), batch_size):
-        batch_conv_ids = all_conv_ids[i:i + batch_size]
-        conv_ids_str = ','.join(f"'{conv_id}'" for conv_id in batch_conv_ids)
+    for i in range(0, len(all_conv_keys), batch_size):
+        batch_conv_keys = all_conv_keys[i:i + batch_size]
+        conv_keys_str = ','.join(str(int(conv_key)) for conv_key in batch_conv_keys)
         
+        # Journeys are matched on the integer keys; the identifiers sent to
+        # the API are decoded from the lookup tables only for the result rows.
         query = f"""
         WITH conversion_sessions AS (
             SELECT 
-                c.conv_id,
-                c.user_id,
+                c.conv_key,
+                c.user_key,
                 c.conv_date,
                 c.conv_time,
-                s.session_id,
+                s.session_key,
                 s.event_date,
                 s.event_time,
-                s.channel_name,
+                s.channel_key,
                 s.holder_engagement,
                 s.closer_engagement,
                 s.impression_interaction,
@@ -66,7 +70,7 @@ def get_customer_journeys_batch(
                 END as conversion
             FROM conversions c
             JOIN session_sources s 
-                ON c.user_id = s.user_id
+                ON c.user_key = s.user_key
                 AND (
                     s.event_date < c.conv_date 
                     OR (
@@ -74,14 +78,30 @@ def get_customer_journeys_batch(
                         AND s.event_time <= c.conv_time
                     )
                 )
-            WHERE c.conv_id IN ({conv_ids_str})
+            WHERE c.conv_key IN ({conv_keys_str})
         )
-        SELECT *
-        FROM conversion_sessions
+        SELECT
+            cl.conv_id,
+            ul.user_id,
+            cs.conv_date,
+            cs.conv_time,
+            sl.session_id,
+            cs.event_date,
+            cs.event_time,
+            chl.channel_name,
+            cs.holder_engagement,
+            cs.closer_engagement,
+            cs.impression_interaction,
+            cs.conversion
+        FROM conversion_sessions cs
+        JOIN conv_lookup cl ON cs.conv_key = cl.conv_key
+        JOIN user_lookup ul ON cs.user_key = ul.user_key
+        JOIN session_lookup sl ON cs.session_key = sl.session_key
+        JOIN channel_lookup chl ON cs.channel_key = chl.channel_key
         ORDER BY 
-            conv_id,
-            event_date,
-            event_time
+            cs.conv_key,
+            cs.event_date,
+            cs.event_time
         """
         
         cursor.execute(query)
@@ -125,16 +145,424 @@ def execute_sql_file(db_path, sql_file_path):
             conn.close()
 
 
+# Text key column of each table in the layout used before the lookup tables
+LEGACY_TABLES = {
+    'conversions': 'conv_id',
+    'session_costs': 'session_id',
+    'session_sources': 'session_id',
+    'attribution_customer_journey': 'conv_id',
+    'channel_reporting': 'channel_name',
+}
+
+LEGACY_COPY_SCRIPT = '''
+    CREATE TABLE IF NOT EXISTS legacy_conversions (
+        conv_id text, user_id text, conv_date text, conv_time text, revenue real
+    );
+
+    CREATE TABLE IF NOT EXISTS legacy_session_costs (
+        session_id text, cost real
+    );
+
+    CREATE TABLE IF NOT EXISTS legacy_session_sources (
+        session_id text, user_id text, event_date text, event_time text, channel_name text,
+        holder_engagement INTEGER, closer_engagement INTEGER, impression_interaction INTEGER
+    );
+
+    INSERT OR IGNORE INTO conv_lookup (conv_id)
+    SELECT conv_id FROM legacy_conversions ORDER BY conv_id;
+
+    INSERT OR IGNORE INTO user_lookup (user_id)
+    SELECT user_id FROM legacy_conversions
+    UNION
+    SELECT user_id FROM legacy_session_sources;
+
+    INSERT OR IGNORE INTO session_lookup (session_id)
+    SELECT session_id FROM legacy_session_sources
+    UNION
+    SELECT session_id FROM legacy_session_costs;
+
+    INSERT OR IGNORE INTO channel_lookup (channel_name)
+    SELECT DISTINCT channel_name FROM legacy_session_sources ORDER BY channel_name;
+
+    INSERT INTO conversions (conv_key, user_key, conv_date, conv_time, revenue)
+    SELECT cl.conv_key, ul.user_key, c.conv_date, c.conv_time, c.revenue
+    FROM legacy_conversions c
+    JOIN conv_lookup cl ON c.conv_id = cl.conv_id
+    JOIN user_lookup ul ON c.user_id = ul.user_id;
+
+    INSERT INTO session_costs (session_key, cost)
+    SELECT sl.session_key, sc.cost
+    FROM legacy_session_costs sc
+    JOIN session_lookup sl ON sc.session_id = sl.session_id;
+
+    INSERT INTO session_sources (
+        session_key, user_key, event_date, event_time, channel_key,
+        holder_engagement, closer_engagement, impression_interaction
+    )
+    SELECT
+        sl.session_key, ul.user_key, ss.event_date, ss.event_time, chl.channel_key,
+        ss.holder_engagement, ss.closer_engagement, ss.impression_interaction
+    FROM legacy_session_sources ss
+    JOIN session_lookup sl ON ss.session_id = sl.session_id
+    JOIN user_lookup ul ON ss.user_id = ul.user_id
+    JOIN channel_lookup chl ON ss.channel_name = chl.channel_name;
+
+    DROP TABLE IF EXISTS legacy_conversions;
+    DROP TABLE IF EXISTS legacy_session_costs;
+    DROP TABLE IF EXISTS legacy_session_sources;
+    DROP TABLE IF EXISTS legacy_attribution_customer_journey;
+    DROP TABLE IF EXISTS legacy_channel_reporting;
+'''
+
+
+def migrate_legacy_schema(db_path, sql_file_path):
+    """
+    Convert a database using text keys into the integer key layout.
+
+    Source tables are renamed, the schema is created from the SQL file and
+    the identifiers are encoded through the lookup tables, all in a single
+    transaction. Result tables are dropped, as they are rebuilt on every run.
+    Leftover legacy_* tables from an interrupted migration are loaded too.
+    Does nothing if the database already uses integer keys.
+    """
+    with open(sql_file_path, 'r') as sql_file:
+        schema_script = sql_file.read()
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+        renames = []
+        for table, key_column in LEGACY_TABLES.items():
+            if table not in tables:
+                continue
+            columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+            if key_column in columns:
+                renames.append(f'ALTER TABLE {table} RENAME TO legacy_{table};')
+
+        leftovers = [table for table in LEGACY_TABLES if f'legacy_{table}' in tables]
+        if not renames and not leftovers:
+            return
+
+        cursor.executescript('\n'.join([
+            'BEGIN;',
+            *renames,
+            schema_script,
+            LEGACY_COPY_SCRIPT,
+            'COMMIT;',
+        ]))
+
+    except sqlite3.Error as e:
+        print(f"Error migrating legacy tables: {e}")
+        conn.rollback()
+        raise
+
+    finally:
+        conn.close()
+
+    # Reclaim the space used by the text keys
+    conn = sqlite3.connect(db_path)
+    conn.execute('VACUUM')
+    conn.close()
+
+
+SOURCE_COLUMNS = {
+    'conversions': ('conv_id', 'user_id', 'conv_date', 'conv_time', 'revenue'),
+    'session_sources': (
+        'session_id', 'user_id', 'event_date', 'event_time', 'channel_name',
+        'holder_engagement', 'closer_engagement', 'impression_interaction',
+    ),
+    'session_costs': ('session_id', 'cost'),
+}
+
+# Columns that may be loaded as NULL, every other source column is required
+NULLABLE_COLUMNS = {'cost'}
+
+
+def is_number(value: Any) -> bool:
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def is_integer(value: Any) -> bool:
+    try:
+        return int(value) == float(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def is_date(value: Any) -> bool:
+    return isinstance(value, str) and re.fullmatch(r'\d{4}-\d{2}-\d{2}', value) is not None
+
+
+def is_time(value: Any) -> bool:
+    return isinstance(value, str) and re.fullmatch(r'\d{2}:\d{2}:\d{2}', value) is not None
+
+
+# The tables are not STRICT, so values that don't match the column type would
+# be stored as text and compared or summed wrongly later
+COLUMN_CHECKS = {
+    'revenue': is_number,
+    'cost': is_number,
+    'holder_engagement': is_integer,
+    'closer_engagement': is_integer,
+    'impression_interaction': is_integer,
+    'conv_date': is_date,
+    'event_date': is_date,
+    'conv_time': is_time,
+    'event_time': is_time,
+}
+
+STAGING_TABLES = {
+    'conversions': '''
+        CREATE TEMP TABLE IF NOT EXISTS staged_conversions (
+            conv_id text, user_id text, conv_date text, conv_time text, revenue real
+        )
+    ''',
+    'session_sources': '''
+        CREATE TEMP TABLE IF NOT EXISTS staged_session_sources (
+            session_id text, user_id text, event_date text, event_time text, channel_name text,
+            holder_engagement INTEGER, closer_engagement INTEGER, impression_interaction INTEGER
+        )
+    ''',
+    'session_costs': '''
+        CREATE TEMP TABLE IF NOT EXISTS staged_session_costs (
+            session_id text, cost real
+        )
+    ''',
+}
+
+STAGED_CONVERSIONS = '''
+    SELECT cl.conv_key, ul.user_key, s.conv_date, s.conv_time, s.revenue
+    FROM staged_conversions s
+    JOIN conv_lookup cl ON s.conv_id = cl.conv_id
+    JOIN user_lookup ul ON s.user_id = ul.user_id
+'''
+
+STAGED_SESSION_SOURCES = '''
+    SELECT
+        sl.session_key, ul.user_key, s.event_date, s.event_time, chl.channel_key,
+        s.holder_engagement, s.closer_engagement, s.impression_interaction
+    FROM staged_session_sources s
+    JOIN session_lookup sl ON s.session_id = sl.session_id
+    JOIN user_lookup ul ON s.user_id = ul.user_id
+    JOIN channel_lookup chl ON s.channel_name = chl.channel_name
+'''
+
+# Statements run after each chunk is staged. Conversions whose journey
+# changes are collected in touched_conversions (directly) or touched_events
+# (sessions, resolved to conversions once the whole file is loaded).
+MERGE_STATEMENTS = {
+    'conversions': (
+        'INSERT OR IGNORE INTO conv_lookup (conv_id) SELECT conv_id FROM staged_conversions',
+        'INSERT OR IGNORE INTO user_lookup (user_id) SELECT user_id FROM staged_conversions',
+        f'''
+        INSERT OR IGNORE INTO touched_conversions (conv_key)
+        SELECT i.conv_key FROM ({STAGED_CONVERSIONS}) i
+        WHERE NOT EXISTS (
+            SELECT 1 FROM conversions c
+            WHERE c.conv_key = i.conv_key
+            AND c.user_key = i.user_key
+            AND c.conv_date = i.conv_date
+            AND c.conv_time = i.conv_time
+            AND c.revenue = i.revenue
+        )
+        ''',
+        f'''
+        INSERT INTO conversions (conv_key, user_key, conv_date, conv_time, revenue)
+        {STAGED_CONVERSIONS}
+        WHERE true
+        ON CONFLICT(conv_key) DO UPDATE SET
+            user_key = excluded.user_key,
+            conv_date = excluded.conv_date,
+            conv_time = excluded.conv_time,
+            revenue = excluded.revenue
+        ''',
+        'DELETE FROM staged_conversions',
+    ),
+    'session_sources': (
+        'INSERT OR IGNORE INTO session_lookup (session_id) SELECT session_id FROM staged_session_sources',
+        'INSERT OR IGNORE INTO user_lookup (user_id) SELECT user_id FROM staged_session_sources',
+        'INSERT OR IGNORE INTO channel_lookup (channel_name) SELECT channel_name FROM staged_session_sources',
+        f'''
+        INSERT INTO touched_events (user_key, event_date, event_time)
+        WITH changed AS (
+            SELECT * FROM ({STAGED_SESSION_SOURCES}) i
+            WHERE NOT EXISTS (
+                SELECT 1 FROM session_sources ss
+                WHERE ss.session_key = i.session_key
+                AND ss.user_key = i.user_key
+                AND ss.event_date = i.event_date
+                AND ss.event_time = i.event_time
+                AND ss.channel_key = i.channel_key
+                AND ss.holder_engagement = i.holder_engagement
+                AND ss.closer_engagement = i.closer_engagement
+                AND ss.impression_interaction = i.impression_interaction
+            )
+        )
+        SELECT user_key, event_date, event_time FROM changed
+        UNION ALL
+        SELECT ss.user_key, ss.event_date, ss.event_time
+        FROM changed ch
+        JOIN session_sources ss ON ch.session_key = ss.session_key
+        ''',
+        f'''
+        INSERT INTO session_sources (
+            session_key, user_key, event_date, event_time, channel_key,
+            holder_engagement, closer_engagement, impression_interaction
+        )
+        {STAGED_SESSION_SOURCES}
+        WHERE true
+        ON CONFLICT(session_key) DO UPDATE SET
+            user_key = excluded.user_key,
+            event_date = excluded.event_date,
+            event_time = excluded.event_time,
+            channel_key = excluded.channel_key,
+            holder_engagement = excluded.holder_engagement,
+            closer_engagement = excluded.closer_engagement,
+            impression_interaction = excluded.impression_interaction
+        ''',
+        'DELETE FROM staged_session_sources',
+    ),
+    'session_costs': (
+        'INSERT OR IGNORE INTO session_lookup (session_id) SELECT session_id FROM staged_session_costs',
+        '''
+        INSERT INTO session_costs (session_key, cost)
+        SELECT sl.session_key, s.cost
+        FROM staged_session_costs s
+        JOIN session_lookup sl ON s.session_id = sl.session_id
+        WHERE true
+        ON CONFLICT(session_key) DO UPDATE SET cost = excluded.cost
+        ''',
+        'DELETE FROM staged_session_costs',
+    ),
+}
+
+
+def load_source_rows(
+        db_path: str,
+        table: str,
+        chunks: Iterable[List[Tuple[Any, ...]]],
+        rebuild_indexes: bool = False
+    ) -> List[str]:
+    """
+    Upsert chunks of rows into one of the source tables in a single transaction.
+
+    Args:
+        db_path: Path to the SQLite database file
+        table: One of conversions, session_sources or session_costs
+        chunks: Lists of rows, with values ordered as in SOURCE_COLUMNS
+        rebuild_indexes: Drop the secondary indexes of the table during the load
+            and create them again at the end. Faster for big loads.
+
+    Returns:
+        conv_id of the conversions whose customer journey changed. Costs are
+        not part of the journeys, so loading session_costs returns none.
+    """
+    if table not in SOURCE_COLUMNS:
+        raise ValueError(f"Unknown source table: {table}")
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cursor = conn.cursor()
+
+    placeholders = ', '.join('?' for _ in SOURCE_COLUMNS[table])
+    columns = list(enumerate(SOURCE_COLUMNS[table]))
+    row_number = 0
+    insert_staged = f'INSERT INTO staged_{table} VALUES ({placeholders})'
+
+    try:
+        cursor.execute(STAGING_TABLES[table])
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS touched_conversions (conv_key INTEGER PRIMARY KEY)')
+        cursor.execute('CREATE TEMP TABLE IF NOT EXISTS touched_events (user_key INTEGER, event_date text, event_time text)')
+
+        cursor.execute('BEGIN')
+
+        indexes = []
+        if rebuild_indexes:
+            indexes = cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (table,)
+            ).fetchall()
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX {name}')
+
+        for chunk in chunks:
+            # Rows with missing keys would be dropped by the lookup joins, so
+            # every row is checked before any of the file is merged
+            for row in chunk:
+                row_number += 1
+                for position, column in columns:
+                    value = row[position]
+                    if value is None:
+                        if column in NULLABLE_COLUMNS:
+                            continue
+                        raise ValueError(f"Row {row_number} of {table} has no {column}: {row}")
+                    if column in COLUMN_CHECKS and not COLUMN_CHECKS[column](value):
+                        raise ValueError(f"Row {row_number} of {table} has an invalid {column}: {row}")
+
+            cursor.executemany(insert_staged, chunk)
+            for statement in MERGE_STATEMENTS[table]:
+                cursor.execute(statement)
+
+        for _, sql in indexes:
+            cursor.execute(sql)
+
+        cursor.execute('''
+            INSERT OR IGNORE INTO touched_conversions (conv_key)
+            SELECT c.conv_key
+            FROM touched_events t
+            JOIN conversions c
+                ON c.user_key = t.user_key
+                AND (
+                    t.event_date < c.conv_date
+                    OR (
+                        t.event_date = c.conv_date
+                        AND t.event_time <= c.conv_time
+                    )
+                )
+        ''')
+
+        cursor.execute('''
+            SELECT cl.conv_id
+            FROM touched_conversions t
+            JOIN conv_lookup cl ON t.conv_key = cl.conv_key
+            ORDER BY t.conv_key
+        ''')
+        affected_conv_ids = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute('COMMIT')
+
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error loading {table}: {e}")
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise
+
+    finally:
+        conn.close()
+
+    return affected_conv_ids
+
+
 def insert_customer_journey(db_path, conv_id, session_id, ihc):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
     try:
         cursor.execute('''
-            INSERT INTO attribution_customer_journey (conv_id, session_id, ihc)
-            VALUES (?, ?, ?)
-        ''', (conv_id, session_id, ihc))
-        
+            INSERT INTO attribution_customer_journey (conv_key, session_key, ihc)
+            SELECT cl.conv_key, sl.session_key, ?
+            FROM conv_lookup cl, session_lookup sl
+            WHERE cl.conv_id = ? AND sl.session_id = ?
+        ''', (ihc, conv_id, session_id))
+
+        if cursor.rowcount == 0:
+            print(f"Error inserting record: unknown conversion {conv_id} or session {session_id}")
+
         conn.commit()
         
     except sqlite3.Error as e:
@@ -155,27 +583,27 @@ def fill_channel_reporting(db_path):
     
     # Insert the aggregated data
     cursor.execute('''
-    INSERT INTO channel_reporting (channel_name, date, cost, ihc, ihc_revenue)
+    INSERT INTO channel_reporting (channel_key, date, cost, ihc, ihc_revenue)
     WITH session_metrics AS (
         SELECT 
-            ss.channel_name,
+            ss.channel_key,
             ss.event_date as date,
             SUM(COALESCE(sc.cost, 0)) as total_cost,
             SUM(COALESCE(acj.ihc, 0)) as total_ihc,
             SUM(COALESCE(acj.ihc * c.revenue, 0)) as total_ihc_revenue
         FROM session_sources ss
         LEFT JOIN session_costs sc 
-            ON ss.session_id = sc.session_id
+            ON ss.session_key = sc.session_key
         LEFT JOIN attribution_customer_journey acj 
-            ON ss.session_id = acj.session_id
+            ON ss.session_key = acj.session_key
         LEFT JOIN conversions c 
-            ON acj.conv_id = c.conv_id
+            ON acj.conv_key = c.conv_key
         GROUP BY 
-            ss.channel_name,
+            ss.channel_key,
             ss.event_date
     )
     SELECT 
-        channel_name,
+        channel_key,
         date,
         total_cost as cost,
         total_ihc as ihc,
@@ -190,7 +618,11 @@ def get_channel_reporting(db_path):
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
-    cursor.execute('SELECT * FROM channel_reporting')
+    cursor.execute('''
+        SELECT cl.channel_name, cr.date, cr.cost, cr.ihc, cr.ihc_revenue
+        FROM channel_reporting cr
+        JOIN channel_lookup cl ON cr.channel_key = cl.channel_key
+    ''')
     conn.commit()
 
     for row in cursor.fetchall():
@@ -211,9 +643,10 @@ def get_channel_metrics(db_path):
         
         # Get all data from channel_reporting table
         cursor.execute("""
-            SELECT channel_name, date, cost, ihc, ihc_revenue 
-            FROM channel_reporting
-            ORDER BY date, channel_name
+            SELECT cl.channel_name, cr.date, cr.cost, cr.ihc, cr.ihc_revenue 
+            FROM channel_reporting cr
+            JOIN channel_lookup cl ON cr.channel_key = cl.channel_key
+            ORDER BY cr.date, cl.channel_name
         """)
         
         # Fetch all rows
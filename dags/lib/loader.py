@@ -0,0 +1,106 @@
+"""Stream source files in chunks into the conversions, session_sources and session_costs tables."""
+import csv
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Any, Iterator, List, Sequence, Tuple
+
+from dags.lib.db import SOURCE_COLUMNS, load_source_rows
+
+
+def load_file(db_path: str,
+              table: str,
+              file_path: str,
+              chunk_size: int = 10000,
+              rebuild_indexes: bool = False,
+) -> List[str]:
+    """
+    Load a CSV or Parquet file into a source table.
+
+    Rows are upserted on their identifier, so a file can be loaded again safely.
+
+    Args:
+        db_path: Path to the SQLite database
+        table: One of conversions, session_sources or session_costs
+        file_path: CSV or Parquet file with the table columns
+        chunk_size: Number of rows inserted on each executemany call
+        rebuild_indexes: Drop and create again the table indexes, for big loads
+
+    Returns:
+        conv_id of the conversions affected by the load
+    """
+    if table not in SOURCE_COLUMNS:
+        raise ValueError(f"Unknown source table: {table}")
+
+    columns = SOURCE_COLUMNS[table]
+    suffix = Path(file_path).suffix.lower()
+
+    if suffix == '.csv':
+        chunks = read_csv_chunks(file_path, columns, chunk_size)
+    elif suffix in ('.parquet', '.pq'):
+        chunks = read_parquet_chunks(file_path, columns, chunk_size)
+    else:
+        raise ValueError(f"Unsupported file format: {file_path}. Use CSV or Parquet")
+
+    return load_source_rows(db_path, table, chunks, rebuild_indexes)
+
+
+def read_csv_chunks(file_path: str,
+                    columns: Sequence[str],
+                    chunk_size: int
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """Read a CSV file with a header row as chunks of rows ordered by columns."""
+    with open(file_path, newline='') as csv_file:
+        reader = csv.DictReader(csv_file)
+        check_columns(file_path, columns, reader.fieldnames or [])
+
+        chunk = []
+        for row in reader:
+            # Empty fields are loaded as NULL
+            chunk.append(tuple(row[column] or None for column in columns))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+
+def read_parquet_chunks(file_path: str,
+                        columns: Sequence[str],
+                        chunk_size: int
+) -> Iterator[List[Tuple[Any, ...]]]:
+    """Read a Parquet file as chunks of rows ordered by columns. Requires pyarrow."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("pyarrow is required for loading Parquet files: poetry add pyarrow") from e
+
+    parquet_file = pq.ParquetFile(file_path)
+    check_columns(file_path, columns, parquet_file.schema_arrow.names)
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=list(columns)):
+        values = [batch.column(column).to_pylist() for column in columns]
+        yield [
+            tuple(to_sql_value(column, value) for column, value in zip(columns, row))
+            for row in zip(*values)
+        ]
+
+
+def check_columns(file_path: str, columns: Sequence[str], found: Sequence[str]):
+    missing = [column for column in columns if column not in found]
+    if missing:
+        raise ValueError(f"Missing columns in {file_path}: {', '.join(missing)}")
+
+
+def to_sql_value(column: str, value: Any) -> Any:
+    """
+    Dates and times are stored as text, as YYYY-MM-DD and HH:MM:SS, because
+    the journeys compare them as strings. Timestamps are split by column.
+    """
+    if isinstance(value, datetime):
+        value = value.time() if column.endswith('_time') else value.date()
+    if isinstance(value, time):
+        return value.isoformat(timespec='seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
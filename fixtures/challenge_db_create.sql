@@ -1,48 +1,74 @@
 
+CREATE TABLE IF NOT EXISTS conv_lookup (
+                                    conv_key INTEGER PRIMARY KEY,
+                                    conv_id text NOT NULL UNIQUE
+                                );
+
+CREATE TABLE IF NOT EXISTS user_lookup (
+                                    user_key INTEGER PRIMARY KEY,
+                                    user_id text NOT NULL UNIQUE
+                                );
+
+CREATE TABLE IF NOT EXISTS session_lookup (
+                                    session_key INTEGER PRIMARY KEY,
+                                    session_id text NOT NULL UNIQUE
+                                );
+
+CREATE TABLE IF NOT EXISTS channel_lookup (
+                                    channel_key INTEGER PRIMARY KEY,
+                                    channel_name text NOT NULL UNIQUE
+                                );
+
 CREATE TABLE IF NOT EXISTS conversions (
-                                    conv_id text NOT NULL,
-                                    user_id text NOT NULL,
+                                    conv_key INTEGER NOT NULL,
+                                    user_key INTEGER NOT NULL,
                                     conv_date text NOT NULL,
                                     conv_time text NOT NULL,
                                     revenue real NOT NULL,
-                                    PRIMARY KEY(conv_id)
+                                    PRIMARY KEY(conv_key)
                                 );
 
+CREATE INDEX IF NOT EXISTS conversions_conv_date ON conversions(conv_date);
+
 
 CREATE TABLE IF NOT EXISTS session_costs (
-                                    session_id text NOT NULL,
+                                    session_key INTEGER NOT NULL,
                                     cost real,
-                                    PRIMARY KEY(session_id)
+                                    PRIMARY KEY(session_key)
                                 );
 
 CREATE TABLE IF NOT EXISTS session_sources (
-                                    session_id text NOT NULL,
-                                    user_id text NOT NULL,
+                                    session_key INTEGER NOT NULL,
+                                    user_key INTEGER NOT NULL,
                                     event_date text NOT NULL,
                                     event_time text NOT NULL,
-                                    channel_name text NOT NULL,
+                                    channel_key INTEGER NOT NULL,
                                     holder_engagement INTEGER NOT NULL,
                                     closer_engagement INTEGER NOT NULL,
                                     impression_interaction INTEGER NOT NULL,
-                                    PRIMARY KEY(session_id)
+                                    PRIMARY KEY(session_key)
                                 );
 
+CREATE INDEX IF NOT EXISTS session_sources_user_event ON session_sources(user_key, event_date, event_time);
+
 CREATE TABLE IF NOT EXISTS attribution_customer_journey (
-                                    conv_id text NOT NULL,
-                                    session_id text NOT NULL,
+                                    conv_key INTEGER NOT NULL,
+                                    session_key INTEGER NOT NULL,
                                     ihc real NOT NULL,
-                                    PRIMARY KEY(conv_id,session_id)
-                                );
+                                    PRIMARY KEY(conv_key,session_key)
+                                ) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS attribution_customer_journey_session ON attribution_customer_journey(session_key, ihc);
 
 DELETE FROM attribution_customer_journey;
-                                
+
 CREATE TABLE IF NOT EXISTS channel_reporting (
-                            channel_name text NOT NULL,
+                            channel_key INTEGER NOT NULL,
                             date text NOT NULL,
                             cost real NOT NULL,
                             ihc real NOT NULL,
                             ihc_revenue real NOT NULL,
-                            PRIMARY KEY(channel_name,date)
-                        );
+                            PRIMARY KEY(channel_key,date)
+                        ) WITHOUT ROWID;
 
 DELETE FROM channel_reporting;
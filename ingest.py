@@ -0,0 +1,80 @@
+"""
+Load source data files into the SQLite database.
+
+This module:
+1. Streams CSV or Parquet files into conversions, session_sources or session_costs
+2. Upserts the rows, so the same file can be loaded again safely
+3. Reports the conversions whose customer journey changed
+
+Usage:
+    python ingest.py conversions data/conversions.csv
+    python ingest.py session_sources data/sessions.parquet --rebuild_indexes --affected_output output/affected.txt
+
+The database must be initialized first by running main.py.
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+from dags.lib.db import SOURCE_COLUMNS
+from dags.lib.loader import load_file
+
+
+# Load environment variables from .env file
+load_dotenv()
+
+
+DB_PATH = os.environ.get("DB_PATH", "challenge.db")
+CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', '10000'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load source data files into the database')
+
+    parser.add_argument('table', choices=sorted(SOURCE_COLUMNS),
+                        help='Table to load the files into')
+    parser.add_argument('files', nargs='+',
+                        help='CSV or Parquet files, with a column for each table column')
+    parser.add_argument('--chunk_size', type=int, default=CHUNK_SIZE,
+                        help='Rows inserted on each batch')
+    parser.add_argument('--rebuild_indexes', action='store_true',
+                        help='Drop the table indexes during the load and create them afterwards')
+    parser.add_argument('--affected_output', default=None,
+                        help='File where the affected conversion ids are written, one per line')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.affected_output:
+        open(args.affected_output, 'w').close()
+
+    affected_conv_ids = {}
+    for file_path in args.files:
+        conv_ids = load_file(
+            db_path=DB_PATH,
+            table=args.table,
+            file_path=file_path,
+            chunk_size=args.chunk_size,
+            rebuild_indexes=args.rebuild_indexes,
+        )
+        print(f"{file_path}: loaded into {args.table}, {len(conv_ids)} conversions affected")
+
+        # Each file is committed on its own, so its affected conversions are
+        # written before loading the next one, in case that one fails
+        new_conv_ids = [conv_id for conv_id in conv_ids if conv_id not in affected_conv_ids]
+        affected_conv_ids.update(dict.fromkeys(new_conv_ids))
+
+        if args.affected_output:
+            with open(args.affected_output, 'a') as output_file:
+                for conv_id in new_conv_ids:
+                    output_file.write(f"{conv_id}\n")
+
+    print(f"Total: {len(affected_conv_ids)} conversions affected")
+
+
+if __name__ == "__main__":
+    main()
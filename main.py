@@ -18,7 +18,7 @@ computing attribution values across customer journeys.
 import os
 from dotenv import load_dotenv
 
-from dags.lib.db import execute_sql_file
+from dags.lib.db import execute_sql_file, migrate_legacy_schema
 
 
 # Load environment variables from .env file
@@ -30,6 +30,7 @@ DB_PATH = os.environ.get("DB_PATH", "challenge.db")
 
 
 def main():
+    migrate_legacy_schema(DB_PATH, SQL_FILE_PATH)
     execute_sql_file(DB_PATH, SQL_FILE_PATH)
 
     
@@ -0,0 +1,132 @@
+"""Tests for loading source files into the database."""
+from datetime import date, datetime, time
+from pathlib import Path
+import sqlite3
+
+import pytest
+
+from dags.lib.db import execute_sql_file
+from dags.lib.loader import load_file, to_sql_value
+
+
+SQL_FILE_PATH = Path(__file__).parents[1] / 'fixtures' / 'challenge_db_create.sql'
+
+CONVERSIONS_CSV = """conv_id,user_id,conv_date,conv_time,revenue
+c1,u1,2023-01-02,10:00:00,100.0
+c2,u2,2023-01-03,11:00:00,50
+"""
+
+SESSIONS_CSV = """session_id,user_id,event_date,event_time,channel_name,holder_engagement,closer_engagement,impression_interaction
+s1,u1,2023-01-01,09:00:00,Email,1,0,0
+s2,u1,2023-01-02,10:00:00,SEO,0,1,1
+s3,u2,2023-01-03,10:00:00,Email,1,1,0
+"""
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'test.db')
+    execute_sql_file(path, SQL_FILE_PATH)
+    return path
+
+
+def write_file(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return str(path)
+
+
+def fetch(db_path, query):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(query).fetchall()
+    conn.close()
+    return rows
+
+
+def test_reload_reports_nothing_affected(db_path, tmp_path):
+    conversions = write_file(tmp_path, 'conversions.csv', CONVERSIONS_CSV)
+    sessions = write_file(tmp_path, 'sessions.csv', SESSIONS_CSV)
+
+    assert load_file(db_path, 'conversions', conversions) == ['c1', 'c2']
+    assert load_file(db_path, 'session_sources', sessions, chunk_size=2) == ['c1', 'c2']
+
+    assert load_file(db_path, 'conversions', conversions) == []
+    assert load_file(db_path, 'session_sources', sessions, rebuild_indexes=True) == []
+    assert fetch(db_path, 'SELECT count(*) FROM session_sources') == [(3,)]
+
+
+def test_session_moved_between_users_affects_both(db_path, tmp_path):
+    load_file(db_path, 'conversions', write_file(tmp_path, 'conversions.csv', CONVERSIONS_CSV))
+    load_file(db_path, 'session_sources', write_file(tmp_path, 'sessions.csv', SESSIONS_CSV))
+
+    moved = write_file(tmp_path, 'moved.csv', (
+        "session_id,user_id,event_date,event_time,channel_name,holder_engagement,closer_engagement,impression_interaction\n"
+        "s3,u1,2023-01-01,10:00:00,Email,1,1,0\n"
+    ))
+
+    assert load_file(db_path, 'session_sources', moved) == ['c1', 'c2']
+
+
+def test_costs_do_not_affect_conversions(db_path, tmp_path):
+    costs = write_file(tmp_path, 'costs.csv', "session_id,cost\ns1,1.5\ns3,\n")
+
+    assert load_file(db_path, 'session_costs', costs) == []
+    assert fetch(db_path, 'SELECT cost FROM session_costs ORDER BY session_key') == [(1.5,), (None,)]
+
+
+@pytest.mark.parametrize('row', [
+    'c3,u3,2023-01-02,10:00:00,',
+    'c3,,2023-01-02,10:00:00,5',
+    'c3,u3,2023-01-02,10:00:00,abc',
+    'c3,u3,02/01/2023,10:00:00,5',
+    'c3,u3,2023-01-02,10:00,5',
+])
+def test_invalid_row_rolls_back_file(db_path, tmp_path, row):
+    conversions = write_file(tmp_path, 'conversions.csv', CONVERSIONS_CSV + row + "\n")
+
+    with pytest.raises(ValueError, match='Row 3 of conversions'):
+        load_file(db_path, 'conversions', conversions, chunk_size=2)
+
+    assert fetch(db_path, 'SELECT count(*) FROM conversions') == [(0,)]
+    assert fetch(db_path, 'SELECT count(*) FROM conv_lookup') == [(0,)]
+
+
+def test_invalid_engagement_flag(db_path, tmp_path):
+    sessions = write_file(tmp_path, 'sessions.csv', SESSIONS_CSV.replace('Email,1,0,0', 'Email,yes,0,0'))
+
+    with pytest.raises(ValueError, match='invalid holder_engagement'):
+        load_file(db_path, 'session_sources', sessions)
+
+
+def test_missing_columns(db_path, tmp_path):
+    with pytest.raises(ValueError, match='Missing columns'):
+        load_file(db_path, 'conversions', write_file(tmp_path, 'sessions.csv', SESSIONS_CSV))
+
+
+def test_to_sql_value():
+    timestamp = datetime(2024, 1, 2, 10, 5, 3, 250)
+
+    assert to_sql_value('conv_date', timestamp) == '2024-01-02'
+    assert to_sql_value('conv_time', timestamp) == '10:05:03'
+    assert to_sql_value('event_date', date(2024, 1, 2)) == '2024-01-02'
+    assert to_sql_value('event_time', time(9, 1, 2, 999)) == '09:01:02'
+    assert to_sql_value('revenue', 1.5) == 1.5
+
+
+def test_load_parquet(db_path, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    path = str(tmp_path / 'conversions.parquet')
+    pq.write_table(pa.table({
+        'conv_id': ['c1'],
+        'user_id': ['u1'],
+        'conv_date': pa.array([datetime(2024, 1, 2)], pa.timestamp('us')),
+        'conv_time': pa.array([datetime(2024, 1, 2, 10, 0, 0, 250)], pa.timestamp('us')),
+        'revenue': [10.0],
+    }), path)
+
+    assert load_file(db_path, 'conversions', path) == ['c1']
+    assert fetch(db_path, 'SELECT conv_date, conv_time, revenue FROM conversions') == [
+        ('2024-01-02', '10:00:00', 10.0)
+    ]